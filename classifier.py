@@ -1,31 +1,85 @@
+import os
+import joblib
 import numpy as np
 import pandas as pd
-from sklearn.naive_bayes import GaussianNB
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score
+DATA_FILE = 'output.parquet'
+MODEL_FILE = 'model.joblib'
+VAR_SMOOTHING = 1e-9
+# bumped whenever what is saved under 'clf' changes, 2 is the _fit_gaussian_nb tuple
+MODEL_FORMAT_VERSION = 2
+
+def _fit_gaussian_nb(X: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Fits a Gaussian naive Bayes model and returns its classes, log priors,
+    per-class feature means and per-class feature variances.
+
+    Like sklearn's GaussianNB, the variances are smoothed by a small fraction
+    of the largest feature variance.
+    """
+    classes, counts = np.unique(y, return_counts=True)
+    means = np.stack([X[y == c].mean(axis=0) for c in classes])
+    variances = np.stack([X[y == c].var(axis=0) for c in classes])
+    variances += VAR_SMOOTHING * X.var(axis=0).max()
+    log_priors = np.log(counts / len(y))
+
+    return classes, log_priors, means, variances
+
+def _load_model(features: list[str]) -> dict | None:
+    """Returns the saved model, or None when it is missing, older than the data,
+    saved in a different format or trained on different features or smoothing,
+    so it has to be fit again."""
+    if not os.path.exists(MODEL_FILE) or os.path.getmtime(MODEL_FILE) < os.path.getmtime(DATA_FILE):
+        return None
+
+    model = joblib.load(MODEL_FILE)
+    if not isinstance(model, dict) or model.get('version') != MODEL_FORMAT_VERSION:
+        return None
+    if model.get('features') != features or model.get('var_smoothing') != VAR_SMOOTHING:
+        return None
+
+    return model
+
+def _predict_gaussian_nb(model: tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray], 
+                         X: np.ndarray) -> np.ndarray:
+    """Returns the most likely class of each row of X, scoring every class at once
+    by broadcasting the rows against the per-class means and variances."""
+    classes, log_priors, means, variances = model
+    log_likelihoods = -0.5 * np.log(2 * np.pi * variances) - 0.5 * (X[:, None, :] - means) ** 2 / variances
+    return classes[(log_likelihoods.sum(axis=-1) + log_priors).argmax(axis=1)]
 
 if __name__ == "__main__":
     print('Starting classifier...')
     np.random.seed(1)
     np.set_printoptions(precision=4, suppress=True)
 
-    df = pd.read_csv('output.csv')
-
-    # print(df.head())
+    df = pd.read_parquet(DATA_FILE)
 
-    X = df.iloc[1:, :-1].values
-    y = df.iloc[1:, -1].values
+    # HP drain rate and the first row have never been part of the training data
+    # (read_csv used to take the first column as the index), so keep them out
+    features = df.columns[1:-1].tolist()
+    X = df.iloc[1:, 1:-1].to_numpy(dtype=np.float32)
+    y = df['target'].to_numpy()[1:]
 
     X_train, X_test, y_train, y_test = train_test_split(X,y, test_size=0.20, random_state=1)
-    stdsc = StandardScaler()
-    X_train_std = stdsc.fit_transform(X_train)
-    X_test_std = stdsc.transform(X_test)
 
-    clf = GaussianNB()
-    clf.fit(X_train_std, y_train)
-    GaussianNB(priors=None)
-    y_pred = clf.predict(X_test_std)
+    # reuse the saved model unless the data, features or model have changed since it was trained
+    model = _load_model(features)
+    if model is not None:
+        print('Loading saved model...')
+        stdsc = model['scaler']
+        clf = model['clf']
+    else:
+        stdsc = StandardScaler()
+        X_train_std = stdsc.fit_transform(X_train)
+
+        clf = _fit_gaussian_nb(X_train_std, y_train)
+        joblib.dump({'version': MODEL_FORMAT_VERSION, 'features': features, 'var_smoothing': VAR_SMOOTHING, 
+                     'scaler': stdsc, 'clf': clf}, MODEL_FILE)
+
+    X_test_std = stdsc.transform(X_test)
+    y_pred = _predict_gaussian_nb(clf, X_test_std)
 
     acc = accuracy_score(y_true=y_test, y_pred=y_pred)
     print(f'Complete! \nAccuracy: {acc}')
\ No newline at end of file
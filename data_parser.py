@@ -1,13 +1,34 @@
 import csv
+import io
 import logging
+import logging.handlers
+import multiprocessing
 import numpy as np
-import math
+import pandas as pd
+import mmap
 import os
+import re
 from dataclasses import dataclass
-from collections import OrderedDict
+from functools import partial
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 MAP_DIRECTORY = 'map_data/'
-OUTPUT_FILE_HEADER = "HPDrainRate,CircleSize,OverallDifficulty,ApproachRate,SliderMultiplier,avgDist,avgTime,wholes,halves,thirds,fourths,sixths,eigths,twelfths,sixteenths,other,target\n"
+CSV_OUTPUT_FILE = 'output.csv'
+PARQUET_OUTPUT_FILE = 'output.parquet'
+OUTPUT_COLUMNS = ['HPDrainRate', 'CircleSize', 'OverallDifficulty', 'ApproachRate', 'SliderMultiplier', 
+                  'SliderTickRate', 'avgDist', 'avgTime', 'wholes', 'halves', 'thirds', 'fourths', 
+                  'sixths', 'eigths', 'twelfths', 'sixteenths', 'other', 'target']
 TIMING_TOLERANCE = 0.05
+PARSE_CHUNK_SIZE = 8  # maps handed to a worker process at a time
+# object type code for each value of the two low type bits, the slider bit wins
+OBJECT_TYPE_CODES = np.array([0, 1, 2, 2], dtype=np.int8)
+FIRST_CURVE_POINT = re.compile(r'^[^|]*\|(-?\d+):(-?\d+)')
+LAST_CURVE_POINT = re.compile(r'(-?\d+):(-?\d+)$')
+HIT_OBJECT_COLUMNS = ['x', 'y', 'time', 'type', 'hitSound', 'params', 'slides', 'length', 
+                      'edgeSounds', 'edgeSets', 'hitSample']
+# only the leading numeric columns are always present, the rest are kept as raw text
+HIT_OBJECT_DTYPES = dict.fromkeys(HIT_OBJECT_COLUMNS, str) | {'x': np.float32, 'y': np.float32, 
+                                                              'time': np.int32, 'type': np.int32}
 FRACTIONS = {
     'wholes': 1,
     'halves': 1/2,
@@ -18,48 +39,30 @@ FRACTIONS = {
     'twelfths': 1/12,
     'sixteenths': 1/16
 }
-
-@dataclass 
-class HitObject():
-    x: int = None
-    y: int = None
-    time: int = None
-
-@dataclass
-class HitCircle(HitObject):
-    pass
-
-@dataclass
-class Slider(HitObject):
-    sliderType: str = None
-    lastX: int = None
-    lastY: int = None
-    lastPoint: tuple[int, int] = None
-    numSlides: int = None
-    sliderLength: float = None
-    timeLength: float = None
-    totalSliderLength: float = None
-    endTime: float = None
-
-@dataclass
-class Spinner(HitObject):
-    endTime: float = None
-
-
-@dataclass
+FRACTION_VALUES = np.array(list(FRACTIONS.values()))
+# a timing counts as a fraction when within TIMING_TOLERANCE of it, e.g. 0.95 to 1.05 for wholes
+FRACTION_LOW_BOUNDS = FRACTION_VALUES * (1 - TIMING_TOLERANCE)
+FRACTION_HIGH_BOUNDS = FRACTION_VALUES * (1 + TIMING_TOLERANCE)
+# order of the timing counts and percents, pairs off by every fraction are counted as other
+TIMING_KEYS = (*FRACTIONS, 'other')
+
+@dataclass(slots=True)
 class MapInfo():
     """
-    xs: a list of x positions of the hit objects.
-    ys: a list of y positions of the hit objects.
-    times: a list of times hit objects appear.
-    x_diffs: a list of differences in x between consecutive objects in the map.
-    y_diffs: a list of differences in y between consecutive objects in the map.
-    dists: a list of distances between consecutive objects in the map.
-    time_diffs: a list of differences in time (milliseconds) between consecutive objects in the map.
+    xs: an array of x positions of the hit objects.
+    ys: an array of y positions of the hit objects.
+    times: an array of times hit objects appear.
+    object_types: an array of type codes of the hit objects: 0 = spinner, 1 = circle, 2 = slider.
+    end_times: an array of times hit objects end (the start time for circles).
+    last_xs: an array of x positions hit objects end on (the end point for sliders).
+    last_ys: an array of y positions hit objects end on (the end point for sliders).
+    x_diffs: an array of differences in x between consecutive objects in the map.
+    y_diffs: an array of differences in y between consecutive objects in the map.
+    dists: an array of distances between consecutive objects in the map.
+    time_diffs: an array of differences in time (milliseconds) between consecutive objects in the map.
     num_circles: the number of hit circle objects in the map.
     num_sliders: the number of slider objects in the map.
     num_spinners: the number of spinner objects in the map.
-    hit_objects: a list of HitCircle, Slider, and Spinner objects.
     slider_counts: a dictionary holding the amount of occurrences of each slider type
     B (Bezier) type sliders
     C (Centripetal catmull-rom) type sliders
@@ -67,285 +70,216 @@ class MapInfo():
     P (Perfect Circle) type sliders
     length: the time between the first and last hit object
     """
-    xs: list[float]
-    ys: list[float]
-    times: list[int]
-    x_diffs: list[float]
-    y_diffs: list[float]
-    dists: list[float]
-    time_diffs: list[int]
+    xs: np.ndarray
+    ys: np.ndarray
+    times: np.ndarray
+    object_types: np.ndarray
+    end_times: np.ndarray
+    last_xs: np.ndarray
+    last_ys: np.ndarray
+    x_diffs: np.ndarray
+    y_diffs: np.ndarray
+    dists: np.ndarray
+    time_diffs: np.ndarray
     num_circles: int
     num_sliders: int
     num_spinners: int
-    hit_objects: list[HitCircle|Slider|Spinner]
     slider_counts: dict[str:int]
     length: int
 
-@dataclass
+@dataclass(slots=True)
 class ComputedInfo():
     """
     avgDist: the average distance between two objects in pixels
     avgTime: the average % of beat length between two objects. Ignores time difference if the difference is over 2 seconds
     (this number is somewhat arbtrirary, but it is to ensure breaks are ignored)
-    timingDict: count of each timing
-    timingPercents: a dictionary storing the percentage of notes mapped at a specific timing interval.
+    timingDict: count of each timing, in the order of TIMING_KEYS
+    timingPercents: an array storing the percentage of notes mapped at a specific timing interval, in the order of TIMING_KEYS.
     Possible options include: wholes, halves, thirds, fourths, sixths, eigths, twelfths, sixteenths. Total
     may not sum to 1 due to missing timing intervals or some excluded notes or rounding.
     """
     avgDist: float
     avgTime: float
-    timingDict: dict[str:int]
-    timingPercents: dict[str:float]
+    timingDict: np.ndarray
+    timingPercents: np.ndarray
 
-def _seek_to_section(in_file, section) -> None:
-    """Jumps to the given section in the file (case sensitive).
+def _get_section(mm: mmap.mmap, section: str, offset: int = 0) -> tuple[bytes, int]:
+    """Returns the raw body of the given section (case sensitive), from the line after
+    its header up to the next blank line, the next section or the end of the file,
+    along with the offset the body ends at.
 
-    The next line read after this function will be the first line
-    of that section.
+    Only the body is copied out of the mapped file, decoding is left to the caller.
 
-    in_file -- the opened file to read
+    mm -- the memory-mapped file
     section -- the name of the section
+    offset -- where to start searching for the header, the end of an earlier section
     """
-    row = in_file.readline()
-    while (f"[{section}]") not in row:
-        row = in_file.readline()
+    start = mm.find(b'\n', mm.find(f"[{section}]".encode(), offset)) + 1
+    ends = [pos for pos in (mm.find(b'\n\n', start), mm.find(b'\n\r\n', start), 
+                            mm.find(b'\n[', start)) if pos != -1]
+    end = min(ends, default=len(mm))
 
-    return
+    return mm[start:end], end
 
-def _read_difficulty(in_file) -> str:
-    """Outputs a comma seperated string with the difficulty parameters.
+def _read_difficulty(section: bytes) -> list[str]:
+    """Outputs a list with the difficulty parameter values, in file order.
 
-    Assumes the file is in v14.osu format,
-    and has not read past the difficulty section.
+    Assumes the file is in v14.osu format.
     
-    in_file -- the opened file to read
+    section -- the body of the difficulty section
     """
     logging.debug("Reading difficulty information.")
-    _seek_to_section(in_file, "Difficulty")
-
-    line = ""
     NUM_DIFFICULTY_ELEMENTS = 6
-    for i in range(NUM_DIFFICULTY_ELEMENTS):
-        row = in_file.readline()
-        line += row.split(':')[1]
-        if i != NUM_DIFFICULTY_ELEMENTS - 1:
-            line += ','
-
-    line = line.replace('\n', '') # remove the line breaks in between
-    return line
+    rows = csv.reader(io.StringIO(section.decode('utf8')), delimiter=':')
+    return [row[1] for row in islice(rows, NUM_DIFFICULTY_ELEMENTS)]
 
-def _get_beat_lengths(in_file) -> list[tuple[int, float]]:
-    """Returns a list of time-length pairs.
+def _get_beat_lengths(section: bytes) -> np.ndarray:
+    """Returns an array of time-length pairs, one row per timing point.
 
-    The first element is the time in milliseconds.
-    The second element is the beat-length.
+    The first column is the time in milliseconds.
+    The second column is the beat-length.
 
-    Assumes the file is in v14.osu format,
-    and has not read past the difficulty section.
+    Assumes the file is in v14.osu format.
 
-    in_file -- the file to read
+    section -- the body of the timing points section
     """
     logging.debug("Reading beat length information.")
-    _seek_to_section(in_file, "TimingPoints")
-    beat_lengths = []
-
-    row = in_file.readline()
-    while row != '\n' and '[' not in row and ']' not in row:
-        parsed = row.split(',')
-        time = int(parsed[0])
-        beat_length = float(parsed[1])
-
-        # if beat_length >= 0: # only want non-inherited beat lengths
-        pair = (time, beat_length)
-        beat_lengths.append(pair)
-            
-        row = in_file.readline()
-    
-    return beat_lengths
-
-def _get_current_beat_length(timingPoints: list[tuple[int, float]], time: int) -> float:
-    prevBeatLength, latestBeatLength = _get_latest_beat_length(timingPoints, time)
-    if latestBeatLength >= 0:
-        beatLength = latestBeatLength
-    else:
-        beatLength = prevBeatLength * abs(latestBeatLength) / 100
-
-    return beatLength
-
-def _get_latest_beat_length(timingPoints: list[tuple[int, float]], time: int) -> tuple[float, float]:
-    """The second value is the beat length corresponding to the largest time in the list 
-    which is less than the given time. Assumes the timingPoints list is sorted. 
-    Assumes non-empty list. The first value is the most recent non-negative beat length before
-    the second value."""
-    pos = timingPoints[0]
-    cur = timingPoints[0]
-    for candidate in timingPoints: # candidate is of form (time, beatLength)
-        if candidate[1] > 0:  # if positive beat length, set as that
-            pos = candidate
-
-        if candidate[0] < time:
-            cur = candidate
-        else:  # exit since the timing point now occurs after the given time
-            break
-
-    return (pos[1], cur[1])
-
-def _get_latest_positive_beat_length(timingPoints: list[tuple[int, float]], time: int) -> float:
-    """Only gives the most recent positive (set) beat length"""
-    most_recent = timingPoints[0][0]
-    for candidate in timingPoints:
-        if candidate[0] > time:
-            break
-
-        if candidate[1] > 0:
-            most_recent = candidate[1]
-    
-    return most_recent
+    # inherited (negative) beat lengths are kept, they scale the previous positive one
+    points = np.loadtxt(io.BytesIO(section), delimiter=',', usecols=(0, 1), ndmin=2)
+    # whole milliseconds, as the times are read as integers
+    points[:, 0] = np.trunc(points[:, 0])
+
+    return points
+
+def _get_current_beat_lengths(timingPoints: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Gives the beat length in effect at each of the given times.
+    Assumes the timingPoints array is sorted by time. Assumes non-empty array.
+
+    The latest timing point strictly before a time sets its beat length. A negative
+    (inherited) one scales the most recent positive beat length, where the timing point
+    right after the latest one is also considered, by its absolute value over 100.
+    Without any earlier timing point the first one is used.
+    """
+    tp_times = timingPoints[:, 0]
+    tp_beats = timingPoints[:, 1]
+
+    # latest positive beat length at or before each timing point, else the first beat length
+    latest = np.maximum.accumulate(np.where(tp_beats > 0, np.arange(len(tp_beats)), -1))
+    tp_positive_beats = np.where(latest >= 0, tp_beats[latest], tp_beats[0])
+
+    idx = np.searchsorted(tp_times, times, side='left')
+    latestBeatLengths = tp_beats[np.maximum(idx - 1, 0)]
+    prevBeatLengths = tp_positive_beats[np.minimum(idx, len(tp_beats) - 1)]
+
+    return np.where(latestBeatLengths >= 0, latestBeatLengths, 
+                    prevBeatLengths * np.abs(latestBeatLengths) / 100)
+
+def _get_latest_positive_beat_lengths(timingPoints: np.ndarray, times: np.ndarray) -> np.ndarray:
+    """Gives the most recent positive (set) beat length at each of the given times.
+    Assumes the timingPoints array is sorted by time.
+
+    Each time is located with one binary search over the timing point times, and the
+    positive beat lengths are forward filled once so every timing point knows the
+    latest one at or before it.
+    """
+    tp_times = timingPoints[:, 0]
+    tp_beats = timingPoints[:, 1]
+
+    # index of the latest positive beat length at or before each timing point
+    latest = np.maximum.accumulate(np.where(tp_beats > 0, np.arange(len(tp_beats)), -1))
+    # the first timing point's time, not its beat length, is kept on purpose so the output matches the old scan
+    default = timingPoints[0, 0]
+    tp_positive_beats = np.where(latest >= 0, tp_beats[latest], default)
+
+    idx = np.searchsorted(tp_times, times, side='right') - 1
+    return np.where(idx >= 0, tp_positive_beats[idx], default)
         
-def _is_circle(num) -> bool:
-    """The type is a circle if and only if the first bit is set."""
-    return num & 1
-
-def _is_slider(num) -> bool:
-    """The type is a slider if and only if the second bit is set."""
-    return num & 1 << 1
-
-def _get_object_type(num) -> str:
-    """Outputs the name of the object type"""
-    if _is_circle(num):
-        return "circle"
-    elif _is_slider(num):
-        return "slider"
-    else:
-        return "spinner"
-
-def _compute_slider_time_length(totalLength: float, beat_lengths: list[tuple[int, float]], 
-                                time: int, sliderMult: float) -> float:
-    """Calculates the length of time a slider exists for.
+def _compute_slider_time_lengths(totalLengths: np.ndarray, beat_lengths: np.ndarray, 
+                                 times: np.ndarray, sliderMult: float) -> np.ndarray:
+    """Calculates the length of time each slider exists for.
     TODO: do some tests
     """
-    beatLength = _get_current_beat_length(beat_lengths, time)
-
-    return totalLength * beatLength / (sliderMult * 100)
-
-def _parse_slider(parsed_cur: list[str], slider_counts: dict[str:int], beat_lengths: list[tuple[int, float]], sliderMult: float) -> Slider:
-    """Returns a Slider object with initiated attributes (except for x, y, time).
-    Also updates the given dictionary's slider counts based on the slider type."""
-    slider = Slider()
-
-    params = parsed_cur[5].split('|')
-    slider_type = params[0]
-    slider_counts[slider_type] += 1
-    first_point = params[1].split(':')
-    first_x = int(first_point[0])
-    first_y = int(first_point[1])
-
-    last_point = params[-1].split(':')
-    last_x = int(last_point[0])
-    last_y = int(last_point[1])
-    numSlides = int(parsed_cur[6])
-    sliderLength = float(parsed_cur[7])
-
-    # even number of slides means it ends on the starting point
-    if numSlides % 2 == 1:
-        slider.lastPoint = (last_x, last_y)
-        slider.lastX = last_x
-        slider.lastY = last_y
-    else:
-        slider.lastPoint = (first_x, first_y)
-        slider.lastX = first_x
-        slider.lastY = first_y
-
-    slider.sliderType = slider_type
-    slider.numSlides = numSlides
-    
-    slider.sliderLength = sliderLength
-    slider.totalSliderLength = numSlides * sliderLength
-    time = int(parsed_cur[2])
-    slider.timeLength = _compute_slider_time_length(slider.totalSliderLength, beat_lengths, 
-                                                    time, sliderMult)
-    slider.endTime = time + slider.timeLength
+    beatLengths = _get_current_beat_lengths(beat_lengths, times)
 
-    return slider
+    return totalLengths * beatLengths / (sliderMult * 100)
 
-def _get_info(in_file, beatLengths: list[tuple[int, float]], sliderMult: float) -> MapInfo:
+def _get_info(section: bytes, beatLengths: np.ndarray, sliderMult: float) -> MapInfo:
     """Returns a list information on the hit objects in the map.
 
     Differences are calculated from the later object to the earlier object.
     Assumes non-empty hit object list.
+
+    section -- the body of the hit objects section
     """
     logging.info("Started reading hit object information.")
-    hit_objects = []
-    num_sliders, num_circles, num_spinners = 0, 0, 0
-    slider_counts = {'B': 0, 'C': 0, 'L': 0, 'P': 0}
-
-    _seek_to_section(in_file, "HitObjects")
-
-    # read from file into memory
-    x_list = []
-    y_list = []
-    time_list = []
-    cur = in_file.readline()
-    start = int(cur.split(',')[2])
-
-    while cur != '':
-        parsed_cur = cur.split(',')
-        new_hitObject = HitObject()
-
-        # update object counts
-        obj_type = int(parsed_cur[3])
-        if _is_slider(obj_type):
-            num_sliders += 1
-            new_hitObject = _parse_slider(parsed_cur, slider_counts, beatLengths, sliderMult)
-            
-        elif _is_circle(obj_type): 
-            num_circles += 1
-            new_hitObject = HitCircle()
-        else: # spinner
-            num_spinners += 1
-            new_hitObject = Spinner()
-            new_hitObject.endTime = int(parsed_cur[5])
-
-        # read hit object information
-        x = int(parsed_cur[0])
-        y = int(parsed_cur[1])
-        time = int(parsed_cur[2])
-
-        x_list.append(x)
-        new_hitObject.x = x
-        
-        y_list.append(y)
-        new_hitObject.y = y
-
-        time_list.append(time)
-        new_hitObject.time = time
-
-        hit_objects.append(new_hitObject)
 
-        end = int(cur.split(',')[2])
-        cur = in_file.readline()
+    # tokenize the whole section in one pass.
+    # rows have a varying number of fields, so every column is named and
+    # the shorter rows are padded with empty strings. every dtype is given and
+    # NaN detection is off so the tokenizer does no per-field inference.
+    # coordinates are bounded by the 512x384 playfield, so float32 positions
+    # and int32 times are plenty
+    df = pd.read_csv(io.BytesIO(section), header=None, names=HIT_OBJECT_COLUMNS, engine='c',
+                     dtype=HIT_OBJECT_DTYPES, na_filter=False)
+    xs = df['x'].to_numpy()
+    ys = df['y'].to_numpy()
+    times = df['time'].to_numpy()
+    types = df['type'].to_numpy()
+
+    # the second bit marks a slider, otherwise the first bit marks a circle.
+    # codes: 0 = spinner, 1 = circle, 2 = slider
+    codes = OBJECT_TYPE_CODES[types & 3]
+    num_spinners, num_circles, num_sliders = np.bincount(codes, minlength=3).tolist()
+
+    # only the leading character of the curve parameters gives the slider type
+    # the slider rows are selected once and every slider column is read from them
+    slider_mask = codes == 2
+    sliders = df.loc[slider_mask, ['params', 'slides', 'length']]
+    slider_params = sliders['params']
+    first_chars = slider_params.str.slice(0, 1).to_numpy()
+    labels, counts = np.unique(first_chars, return_counts=True)
+    slider_counts = {'B': 0, 'C': 0, 'L': 0, 'P': 0}
+    slider_counts.update(zip(labels.tolist(), counts.tolist()))
+
+    # pull the end point of every slider out of its curve parameters in bulk.
+    # even number of slides means it ends on the first curve point
+    num_slides = sliders['slides'].astype(np.int32).to_numpy()
+    first_points = slider_params.str.extract(FIRST_CURVE_POINT).astype(np.float32).to_numpy()
+    last_points = slider_params.str.extract(LAST_CURVE_POINT).astype(np.float32).to_numpy()
+    end_points = np.where((num_slides % 2 == 1)[:, None], last_points, first_points)
+
+    # how long each slider lasts follows from its length over all of its slides
+    slider_lengths = sliders['length'].astype(np.float64).to_numpy()
+    total_lengths = num_slides * slider_lengths
+    slider_time_lengths = _compute_slider_time_lengths(total_lengths, beatLengths, 
+                                                       times[slider_mask], sliderMult)
+
+    # objects end where they start, except sliders (after all of their slides)
+    # and spinners (whose end time sits where the curve parameters would be)
+    end_times = times.astype(np.float64)
+    end_times[slider_mask] += slider_time_lengths
+    spinner_mask = codes == 0
+    end_times[spinner_mask] = df.loc[spinner_mask, 'params'].astype(np.int32).to_numpy()
+
+    last_xs = xs.copy()
+    last_ys = ys.copy()
+    last_xs[slider_mask] = end_points[:, 0]
+    last_ys[slider_mask] = end_points[:, 1]
     
-    length = end - start
+    length = int(times[-1] - times[0])
 
     # short computations
-    objects = np.array([x_list, y_list, time_list])
-    x_diff, y_diff, time_diff = np.diff(objects, axis=1)
-    distances = np.sqrt(x_diff ** 2 + y_diff ** 2)
+    x_diff = np.subtract(xs[1:], xs[:-1])
+    y_diff = np.subtract(ys[1:], ys[:-1])
+    time_diff = np.subtract(times[1:], times[:-1])
+    distances = np.hypot(x_diff, y_diff)
 
-    outInfo = MapInfo(x_list, y_list, time_list, x_diff, y_diff, distances, 
-                      time_diff, num_circles, num_sliders, num_spinners,
-                      hit_objects, slider_counts, length)
+    outInfo = MapInfo(xs, ys, times, codes, end_times, last_xs, last_ys, x_diff, y_diff, distances, 
+                      time_diff, num_circles, num_sliders, num_spinners, slider_counts, length)
     logging.info("Finished reading hit object information.")
     return outInfo
 
-def _in_tolerance(input: float, target: float, tolerance: float) -> bool:
-    """
-    Meant for positive values. For target 1, tolerance 0.05, 0.95 to 1.05 is 
-    acceptable.
-    """
-    return target * (1 - tolerance) <= input <= target * (1 + tolerance)
-
-def _compute_attributes(info: MapInfo, beat_lengths: list[tuple[int, float]]) -> ComputedInfo:
+def _compute_attributes(info: MapInfo, beat_lengths: np.ndarray) -> ComputedInfo:
     """
     Does more "advanced" computation using the map info and returns the computed information in a
     ComputedInfo object.
@@ -353,154 +287,115 @@ def _compute_attributes(info: MapInfo, beat_lengths: list[tuple[int, float]]) ->
     logging.info("Started computing attributes.")
 
     output = ComputedInfo(None, None, None, None)  # to be initialized
-    timingDict = {
-        'wholes': 0,
-        'halves': 0,
-        'thirds': 0,
-        'fourths': 0,
-        'sixths': 0,
-        'eigths': 0,
-        'twelfths': 0,
-        'sixteenths': 0,
-        'other': 0
-    }
-
-    timingPercents = OrderedDict()
-    timingPercents['wholes'] = 0
-    timingPercents['halves'] = 0
-    timingPercents['thirds'] = 0
-    timingPercents['fourths'] = 0
-    timingPercents['sixths'] = 0
-    timingPercents['eigths'] = 0
-    timingPercents['twelfths'] = 0
-    timingPercents['sixteenths'] = 0
-    timingPercents['other'] = 0
-
-    numObjects = len(info.hit_objects)
-    
-    totalTimeDiff = 0
-    totalDistDiff = 0
-    
-    times = info.time_diffs
-    for index, second in enumerate(info.hit_objects):
+    numObjects = len(info.times)
 
-        if index == 0:
-            continue
-        
-        # current beat length
-        beatLength = _get_latest_positive_beat_length(beat_lengths, second.time)
-
-        # time diff calculation
-        first = info.hit_objects[index - 1]
-        if isinstance(first, Slider) or isinstance(first, Spinner):
-            timeDiff = second.time - first.endTime
-        else: # circle
-            timeDiff = times[index - 1]
-            
-        # print(timeDiff)
-        if timeDiff < 2000:            
-            totalTimeDiff += timeDiff
-        else:
-            numObjects -= 1
-        
-        # timing calculation
-        timing = timeDiff / beatLength
-
-        incremented = False
-        for key, value in FRACTIONS.items():
-            if incremented:
-                break
-
-            if _in_tolerance(timing, value, TIMING_TOLERANCE):
-                timingDict[key] += 1
-                incremented = True
-            
-        if not incremented:
-            timingDict['other'] += 1
-        
-        # distance diff calculation
-        if isinstance(first, Slider):
-            totalDistDiff += math.sqrt((second.x - first.lastX) ** 2 + (second.y - first.lastY) ** 2)
-        
-        else:
-            totalDistDiff += math.sqrt((second.x - first.x) ** 2 + (second.y - first.y) ** 2)
+    # time diff calculation, measured from the end of sliders and spinners.
+    # gaps of 2 seconds or more are breaks and are left out of the average
+    timeDiffs = info.times[1:] - info.end_times[:-1]
+    counted = timeDiffs < 2000
+    totalTimeDiff = np.sum(timeDiffs, where=counted)
+    numObjects -= len(counted) - np.count_nonzero(counted)
 
-    
-    for timingType in timingDict:
-        timingPercents[timingType] = timingDict[timingType] / len(info.hit_objects) * 100  # multiply by 100 to make it a percent
+    # current beat length of each later object
+    beatLengths = _get_latest_positive_beat_lengths(beat_lengths, info.times[1:])
+
+    # timing calculation: test every pair against every fraction at once, and
+    # count each pair under the first fraction it is close to, or under other
+    timings = timeDiffs / beatLengths
+    close = (FRACTION_LOW_BOUNDS <= timings[:, None]) & (timings[:, None] <= FRACTION_HIGH_BOUNDS)
+    buckets = np.where(close.any(axis=1), close.argmax(axis=1), len(FRACTION_VALUES))
+    timingDict = np.bincount(buckets, minlength=len(TIMING_KEYS))
+
+    # distance diff calculation, measured from the end point of sliders
+    dists = np.hypot(info.xs[1:] - info.last_xs[:-1], info.ys[1:] - info.last_ys[:-1], dtype=np.float64)
+    totalDistDiff = dists.sum()
+
+    timingPercents = timingDict / len(info.times) * 100  # multiply by 100 to make it a percent
 
     # time diff doesn't count objects with 2 second+ gap, but dist always counts
     # count the number of gaps, so one less than the number of counted objects
     avgTimeDiff = totalTimeDiff / (numObjects - 1)
-    avgDist = totalDistDiff / (len(info.hit_objects) - 1)
+    avgDist = totalDistDiff / (len(info.times) - 1)
 
     # assigning values
     output.avgDist = avgDist
-    print(avgDist)
+    logging.debug("avgDist=%f", avgDist)
     output.avgTime = avgTimeDiff
     output.timingDict = timingDict
     output.timingPercents = timingPercents
 
     logging.info("Finished computing attributes.")
-    # print(output)
     return output
     
 
-def parse_osu(input_file_name: str, out, target: str):
-    """Parses the osu formatted file and outputs it as a csv file."""
+def parse_osu(input_file_name: str, target: str) -> list:
+    """Parses the osu formatted file and returns its row of the output, 
+    in the order of OUTPUT_COLUMNS."""
     logging.info(f"Started parsing file {input_file_name}.")
-    # TODO apparently using with is better so change it
-    in_file = open(input_file_name, encoding="utf8", mode='r')
-    
-    # first line is always version declaration
-    version = in_file.readline()
-
-    line = ''
-    # read in difficulty
-    difficulty = _read_difficulty(in_file)
-    line += difficulty + ','
+    with open(input_file_name, 'rb') as in_file, \
+            mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # read in difficulty
+        # the sections come in this order, so each search resumes where the last ended
+        difficulty_section, offset = _get_section(mm, "Difficulty")
+        difficulty = _read_difficulty(difficulty_section)
+
+        sliderMult = float(difficulty[4])
+        
+        # get list of beat lengths
+        timing_points_section, offset = _get_section(mm, "TimingPoints", offset)
+        beat_lengths = _get_beat_lengths(timing_points_section)
 
-    sliderMult = float(difficulty.split(',')[4])
-    
-    # get list of beat lengths
-    beat_lengths = _get_beat_lengths(in_file)
+        hit_objects_section, _ = _get_section(mm, "HitObjects", offset)
 
-    info = _get_info(in_file, beat_lengths, sliderMult)
+    info = _get_info(hit_objects_section, beat_lengths, sliderMult)
     computed = _compute_attributes(info, beat_lengths)
     
-    # write the computed info to the csv
-    line += str(computed.avgDist) + ','
-    line += str(computed.avgTime) + ','
-
-    timingPercents = computed.timingPercents
-    for key, percent in timingPercents.items():
-        line += str(percent) + ','
+    # the computed info followed by the map classification answer
+    row = difficulty + [computed.avgDist, computed.avgTime]
+    row += computed.timingPercents.tolist()
+    row.append(target)
 
-    # write the map classification answer
-    line += target
-
-    line += '\n'
-    out.write(line)
-
-    in_file.close()
     logging.info(f"Finished parsing file {input_file_name}.")
-    return
+    return row
 
-def parse_target(out, target: str):
+def parse_target(target: str, executor) -> list[list]:
+    """Parses the maps of the target across the executor's processes.
+    The rows are returned in directory order."""
     targetDirectory = MAP_DIRECTORY + target + '/'
-    for filename in os.listdir(targetDirectory):
-        parse_osu(targetDirectory + filename, out, target)
+    with os.scandir(targetDirectory) as entries:
+        files = [entry.path for entry in entries if entry.is_file()]
+    return list(executor.map(partial(parse_osu, target=target), files, chunksize=PARSE_CHUNK_SIZE))
 
-    return
+def _init_worker_logging(queue, level: int):
+    """Sends the worker's log records to the main process through the queue.
+    Workers only inherit the main process' logging setup when forked."""
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(queue)]
+    root.setLevel(level)
 
 def parse_data():
-    out = open("output.csv", 'w')
-    out.write(OUTPUT_FILE_HEADER)
-
-    parse_target(out, '0')  # jump
-    parse_target(out, '1')  # stream
-
-    out.close()
+    # the workers log through a queue that the main process drains into its own handlers
+    root = logging.getLogger()
+    log_queue = multiprocessing.Queue()
+    listener = logging.handlers.QueueListener(log_queue, *root.handlers, respect_handler_level=True)
+    listener.start()
+    try:
+        # every map is parsed independently, so spread them over all cores
+        with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=_init_worker_logging, 
+                                 initargs=(log_queue, root.level)) as executor:
+            rows = parse_target('0', executor)  # jump
+            rows += parse_target('1', executor)  # stream
+    finally:
+        listener.stop()
+
+    with open(CSV_OUTPUT_FILE, 'w', newline='', buffering=1 << 20) as out:
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow(OUTPUT_COLUMNS)
+        writer.writerows(rows)
+
+    # typed, columnar copy of the same rows so the classifier skips tokenizing the csv
+    df = pd.DataFrame(rows, columns=OUTPUT_COLUMNS).apply(pd.to_numeric)
+    df.to_parquet(PARQUET_OUTPUT_FILE, compression='zstd')
     return
 
 if __name__ == "__main__":